@@ -2,17 +2,22 @@
 import random
 import logging
 import time
+import signal
+import threading
 import json
 import os
 import sys
 import re
 import requests
-import copy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from plexapi.server import PlexServer
 from plexapi.exceptions import NotFound, BadRequest, Unauthorized
 from datetime import datetime, timedelta
 import argparse # <--- ADDED FOR DRY-RUN ARGUMENT
-from jsonschema import validate, exceptions as jsonschema_exceptions # <--- ADDED FOR CONFIG VALIDATION
+from jsonschema import validators, exceptions as jsonschema_exceptions # <--- ADDED FOR CONFIG VALIDATION
 
 # --- Configuration & Constants (Updated for Docker) ---
 APP_DIR = ''
@@ -24,10 +29,27 @@ CONFIG_PATH = os.path.join(CONFIG_DIR, 'config.json')
 LOG_FILE = os.path.join(LOG_DIR, 'collexions.log')
 SELECTED_COLLECTIONS_FILE = os.path.join(DATA_DIR, 'selected_collections.json')
 STATUS_FILE = os.path.join(DATA_DIR, 'status.json')
+MAX_HISTORY_ENTRIES = 500 # Most recent timestamp buckets kept in the history file
 
 # --- Script-level global for Dry-Run Mode ---
 _DRY_RUN_MODE_ACTIVE = False
 
+# --- Dedicated PRNG for all collection selection ---
+_RNG = random.Random()
+
+# --- Parsed config, reused until config.json changes on disk ---
+_CONFIG_CACHE = {"stamp": None, "config": None}
+
+# --- Shared HTTP session (keep-alive connections for Plex, Discord and trending APIs) ---
+_HTTP_SESSION = requests.Session()
+_HTTP_ADAPTER = HTTPAdapter(pool_connections=4, pool_maxsize=16) # No retries: a stalled Plex call must not wait out its 90s timeout repeatedly
+_HTTP_SESSION.mount('https://', _HTTP_ADAPTER)
+_HTTP_SESSION.mount('http://', _HTTP_ADAPTER)
+# Webhook posts are retried on connect errors, 429 and 5xx; read errors are not, since the message may already be posted.
+_DISCORD_ADAPTER = HTTPAdapter(max_retries=Retry(total=2, read=0, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset({'POST'}), raise_on_status=False))
+_HTTP_SESSION.mount('https://discord.com/', _DISCORD_ADAPTER)
+_HTTP_SESSION.mount('https://discordapp.com/', _DISCORD_ADAPTER)
+
 # --- Configuration Schema Definition ---
 CONFIG_SCHEMA = {
     "type": "object",
@@ -91,6 +113,11 @@ CONFIG_SCHEMA = {
     "required": ["plex_url", "plex_token"]
 }
 
+# Schema is checked and its validator built once; jsonschema.validate() redoes both on every call.
+_CONFIG_VALIDATOR_CLS = validators.validator_for(CONFIG_SCHEMA)
+_CONFIG_VALIDATOR_CLS.check_schema(CONFIG_SCHEMA)
+_CONFIG_VALIDATOR = _CONFIG_VALIDATOR_CLS(CONFIG_SCHEMA)
+
 
 # --- Setup Logging ---
 if not os.path.exists(LOG_DIR):
@@ -116,16 +143,43 @@ logging.basicConfig(
 logging.getLogger("requests").setLevel(logging.WARNING)
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 
-# --- Status Update Function ---
-def update_status(status_message="Running", next_run_timestamp=None):
-    global _DRY_RUN_MODE_ACTIVE
-    if not os.path.exists(DATA_DIR):
+# --- Data Directory ---
+_DATA_DIR_READY = False
+
+def ensure_data_dir():
+    """Creates DATA_DIR if needed. After the first success, later calls skip the filesystem check."""
+    global _DATA_DIR_READY
+    if _DATA_DIR_READY: return True
+    if not os.path.isdir(DATA_DIR):
         try:
             os.makedirs(DATA_DIR, exist_ok=True)
             logging.info(f"Created data directory: {DATA_DIR}")
         except OSError as e:
-            logging.error(f"Could not create data directory {DATA_DIR}: {e}. Status update might fail.")
-            return
+            logging.error(f"Could not create data directory {DATA_DIR}: {e}.")
+            return False
+    _DATA_DIR_READY = True
+    return True
+
+# --- Status Update Function ---
+_LAST_STATUS_WRITTEN = {"key": None}
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """Writes JSON to a temp file next to path, then swaps it in so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+        os.replace(tmp_path, path)
+    except Exception:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+
+def update_status(status_message="Running", next_run_timestamp=None):
+    global _DRY_RUN_MODE_ACTIVE
+    if not ensure_data_dir():
+        logging.error("Data directory unavailable. Status update skipped.")
+        return
 
     effective_status_message = status_message
     if _DRY_RUN_MODE_ACTIVE:
@@ -137,16 +191,20 @@ def update_status(status_message="Running", next_run_timestamp=None):
              status_data["next_run_timestamp"] = next_run_timestamp
         else:
              logging.warning(f"Invalid next_run_timestamp type ({type(next_run_timestamp)}), skipping.")
+
+    status_key = (effective_status_message, status_data.get("next_run_timestamp"))
+    if status_key == _LAST_STATUS_WRITTEN["key"] and os.path.exists(STATUS_FILE):
+        return # Only last_update would change; skip the redundant write
     try:
-        with open(STATUS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(status_data, f, ensure_ascii=False, indent=4)
+        write_json_atomic(STATUS_FILE, status_data, separators=(',', ':'))
+        _LAST_STATUS_WRITTEN["key"] = status_key
     except Exception as e:
         logging.error(f"Error writing status file '{STATUS_FILE}': {e}")
 
 # --- Functions ---
 def load_selected_collections():
-    if not os.path.exists(DATA_DIR):
-        logging.warning(f"Data directory {DATA_DIR} not found when loading history. Assuming no history.")
+    if not ensure_data_dir():
+        logging.warning(f"Data directory {DATA_DIR} unavailable when loading history. Assuming no history.")
         return {}
     if os.path.exists(SELECTED_COLLECTIONS_FILE):
         try:
@@ -156,7 +214,7 @@ def load_selected_collections():
             with open(SELECTED_COLLECTIONS_FILE, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 if isinstance(data, dict):
-                    logging.debug(f"Loaded {len(data)} entries from history file {SELECTED_COLLECTIONS_FILE}")
+                    logging.debug("Loaded %d entries from history file %s", len(data), SELECTED_COLLECTIONS_FILE)
                     return data
                 else:
                     logging.error(f"Invalid format in {SELECTED_COLLECTIONS_FILE} (not a dict). Resetting history.");
@@ -178,17 +236,12 @@ def save_selected_collections(selected_collections):
         logging.info(f"DRY-RUN: Would save {len(selected_collections)} entries to history file {SELECTED_COLLECTIONS_FILE}.")
         return
 
-    if not os.path.exists(DATA_DIR):
-        try:
-            os.makedirs(DATA_DIR, exist_ok=True)
-            logging.info(f"Created data directory before saving history: {DATA_DIR}")
-        except OSError as e:
-            logging.error(f"Could not create data directory {DATA_DIR}: {e}. History saving failed.")
-            return
+    if not ensure_data_dir():
+        logging.error("Data directory unavailable. History saving failed.")
+        return
     try:
-        with open(SELECTED_COLLECTIONS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(selected_collections, f, ensure_ascii=False, indent=4)
-            logging.debug(f"Saved history to {SELECTED_COLLECTIONS_FILE}")
+        write_json_atomic(SELECTED_COLLECTIONS_FILE, selected_collections, separators=(',', ':'))
+        logging.debug("Saved history to %s", SELECTED_COLLECTIONS_FILE)
     except Exception as e:
         logging.error(f"Error saving history to {SELECTED_COLLECTIONS_FILE}: {e}")
 
@@ -198,66 +251,116 @@ def get_recently_pinned_collections(selected_collections_history, config):
         logging.warning(f"Invalid 'repeat_block_hours' ({repeat_block_hours}), defaulting 12.");
         repeat_block_hours = 12
     if repeat_block_hours == 0:
-        logging.info("Repeat block hours set to 0. Recency check disabled for non-special collections.")
+        log_recently_pinned_summary(set(), repeat_block_hours)
         return set()
 
     cutoff_time = datetime.now() - timedelta(hours=repeat_block_hours)
     recent_titles = set()
-    timestamps_to_keep = {}
-    logging.info(f"Checking history since {cutoff_time.strftime('%Y-%m-%d %H:%M:%S')} for recently pinned non-special items (Repeat block: {repeat_block_hours} hours)")
-    history_items_copy = list(selected_collections_history.items())
+    stale_timestamps = []
+    logging.info("Checking history since %s for recently pinned non-special items (Repeat block: %s hours)", cutoff_time.replace(microsecond=0), repeat_block_hours)
 
-    for timestamp_str, titles in history_items_copy:
+    # Entries are appended chronologically, so scan newest-first and stop at the first one outside the window.
+    history_newest_first = reversed(selected_collections_history)
+    for timestamp_str in history_newest_first:
+        titles = selected_collections_history[timestamp_str]
         if not isinstance(titles, list):
              logging.warning(f"Cleaning invalid history entry (value not a list): {timestamp_str}")
-             selected_collections_history.pop(timestamp_str, None)
+             stale_timestamps.append(timestamp_str)
              continue
         try:
-            try: timestamp = datetime.fromisoformat(timestamp_str)
-            except ValueError: timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
-            if timestamp >= cutoff_time:
-                valid_titles = {t for t in titles if isinstance(t, str)}
-                recent_titles.update(valid_titles)
-                timestamps_to_keep[timestamp_str] = titles
-        except ValueError:
+            timestamp = datetime.fromisoformat(timestamp_str) # Also accepts the legacy 'YYYY-MM-DD HH:MM:SS' form
+            outside_window = timestamp < cutoff_time # Offset-aware keys raise TypeError against the naive cutoff
+        except (TypeError, ValueError):
              logging.warning(f"Cleaning invalid date format in history: '{timestamp_str}'. Entry removed.")
-             selected_collections_history.pop(timestamp_str, None)
-        except Exception as e:
-             logging.error(f"Cleaning problematic history entry '{timestamp_str}': {e}. Entry removed.")
-             selected_collections_history.pop(timestamp_str, None)
-
-    keys_in_history = set(selected_collections_history.keys())
-    keys_to_remove = keys_in_history - set(timestamps_to_keep.keys())
-    removed_count = 0
-    if keys_to_remove:
-        for key in keys_to_remove:
-            selected_collections_history.pop(key, None)
-            removed_count += 1
-        logging.info(f"Removed {removed_count} old entries from history file (in memory).")
-
-    if recent_titles:
-        logging.info(f"Recently pinned non-special collections (excluded due to {repeat_block_hours}h block): {sorted(list(recent_titles))}")
+             stale_timestamps.append(timestamp_str)
+             continue
+        if outside_window:
+            stale_timestamps.append(timestamp_str)
+            stale_timestamps.extend(history_newest_first) # Everything older is outside the window too
+            break
+        recent_titles |= {t for t in titles if isinstance(t, str)}
+
+    for timestamp_str in stale_timestamps: # Removed in place; kept entries stay in their original order
+        del selected_collections_history[timestamp_str]
+    if stale_timestamps:
+        logging.info(f"Removed {len(stale_timestamps)} old entries from history file (in memory).")
+
+    log_recently_pinned_summary(recent_titles, repeat_block_hours)
+    return recent_titles
+
+def log_recently_pinned_summary(recent_titles, repeat_block_hours):
+    """Logs the recency-block summary that the Dashboard reads from each library's log block."""
+    if repeat_block_hours == 0:
+        logging.info("Repeat block hours set to 0. Recency check disabled for non-special collections.")
+    elif recent_titles:
+        if logging.getLogger().isEnabledFor(logging.INFO): # Skip sorting a log-only listing
+            logging.info("Recently pinned non-special collections (excluded due to %sh block): %s", repeat_block_hours, sorted(recent_titles))
     else:
         logging.info("No recently pinned non-special collections found within the repeat block window.")
-    return recent_titles
 
 
-def is_regex_excluded(title, patterns):
-    if not patterns or not isinstance(patterns, list): return False
+def compile_exclusion_patterns(patterns):
+    """Compiles regex exclusion patterns once; invalid patterns are logged and dropped."""
+    compiled = []
+    if not patterns or not isinstance(patterns, list): return compiled
     for pattern_str in patterns:
         if not isinstance(pattern_str, str) or not pattern_str: continue
         try:
-            if re.search(pattern_str, title, re.IGNORECASE):
-                logging.info(f"Excluding '{title}' based on regex pattern: '{pattern_str}'")
-                return True
+            compiled.append(re.compile(pattern_str, re.IGNORECASE))
         except re.error as e:
             logging.error(f"Invalid regex pattern '{pattern_str}' in config: {e}. Skipping this pattern.")
-            continue
-        except Exception as e:
-            logging.error(f"Unexpected error during regex check for title '{title}', pattern '{pattern_str}': {e}")
-            return False
+    return compiled
+
+
+_REGEX_BACKREFERENCE = re.compile(r'\\\d|\(\?P=')
+
+def combine_exclusion_patterns(compiled_patterns):
+    """Joins compiled patterns into one alternation for a single-pass check, or None if that would change their meaning."""
+    # Groups are renumbered inside an alternation, which only matters to backreferences; patterns using them stay per-pattern.
+    if len(compiled_patterns) < 2 or any(p.groups and _REGEX_BACKREFERENCE.search(p.pattern) for p in compiled_patterns): return None
+    try: # Duplicate group names across patterns fail here and fall back to the per-pattern loop
+        return re.compile("|".join(f"(?:{p.pattern})" for p in compiled_patterns), re.IGNORECASE)
+    except re.error:
+        return None
+
+
+def is_regex_excluded(title, compiled_patterns, combined_pattern=None):
+    if combined_pattern is not None and not combined_pattern.search(title):
+        return False
+    for pattern in compiled_patterns: # Patterns are pre-compiled, so search() cannot raise re.error here
+        if pattern.search(title):
+            logging.info(f"Excluding '{title}' based on regex pattern: '{pattern.pattern}'")
+            return True
     return False
 
+def parse_month_day(date_str):
+    """Parses an 'MM-DD' string into a (month, day) tuple, or None if malformed."""
+    try:
+        month, day = (int(part) for part in date_str.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return (month, day) if 1 <= month <= 12 and 1 <= day <= 31 else None
+
+def build_category_index(valid_categories):
+    """Builds the title/category lookups filter_collections needs for one library's enabled categories."""
+    # Titles are kept per category entry: category names are not required to be unique.
+    category_titles = tuple(frozenset(cat.get('collections', ())) for cat in valid_categories)
+    categories_by_title = defaultdict(list)
+    first_position_by_name = {}
+    for position, cat in enumerate(valid_categories):
+        first_position_by_name.setdefault(cat.get('category_name'), position)
+        for title in cat.get('collections', ()):
+            categories_by_title[title].append(cat.get('category_name'))
+    return {
+        'category_titles': category_titles,
+        'categories_by_title': {title: tuple(names) for title, names in categories_by_title.items()}, # Immutable; shared across runs
+        'all_titles': frozenset().union(*category_titles),
+        # Default mode budgets slots per name (last definition's pin_count wins) and excludes the first
+        # same-named definition's titles once a name is served.
+        'pin_counts': {cat.get('category_name'): cat.get('pin_count', 0) for cat in valid_categories},
+        'first_position_by_name': first_position_by_name,
+    }
+
 def load_config():
     global _DRY_RUN_MODE_ACTIVE
     if not os.path.exists(CONFIG_DIR):
@@ -277,13 +380,15 @@ def load_config():
         with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
             config_data = json.load(f)
 
-        validate(instance=config_data, schema=CONFIG_SCHEMA)
+        validation_error = jsonschema_exceptions.best_match(_CONFIG_VALIDATOR.iter_errors(config_data)) # Same error jsonschema.validate() would raise
+        if validation_error is not None:
+            raise validation_error
         logging.info("Configuration successfully validated against schema.")
 
         for prop, definition in CONFIG_SCHEMA.get("properties", {}).items():
             if "default" in definition and prop not in config_data:
                 config_data[prop] = definition["default"]
-                logging.debug(f"Applied schema default for '{prop}': {definition['default']}")
+                logging.debug("Applied schema default for '%s': %s", prop, definition['default'])
         
         config_data.setdefault('library_names', [])
         config_data.setdefault('number_of_collections_to_pin', {})
@@ -306,6 +411,28 @@ def load_config():
             except (ValueError, TypeError): pass
             config_data['random_category_skip_percent'] = clamped_perc
 
+        # Regex exclusions compiled once per load; invalid patterns are logged here rather than on every run.
+        compiled_regex = compile_exclusion_patterns(config_data['regex_exclusion_patterns'])
+        config_data['_compiled_regex_exclusions'] = (compiled_regex, combine_exclusion_patterns(compiled_regex))
+
+        config_data['_all_special_titles'] = get_all_special_collection_names(config_data) # Date-independent, so fixed per load
+
+        # Explicit exclusions stripped and deduplicated once, rather than on every library's filter pass.
+        config_data['_exclusion_titles'] = frozenset(name.strip() for name in config_data['exclusion_list'] if isinstance(name, str) and name.strip())
+
+        for special in config_data['special_collections']:
+            if isinstance(special, dict):
+                special['_start_md'] = parse_month_day(special.get('start_date'))
+                special['_end_md'] = parse_month_day(special.get('end_date'))
+
+        # Enabled categories (pin_count > 0 with collections) per library, filtered once per load.
+        config_data['_valid_categories'] = {
+            lib: [cat for cat in cats if isinstance(cat, dict) and cat.get('pin_count', 0) > 0 and cat.get('collections')]
+            for lib, cats in config_data['categories'].items() if isinstance(cats, list)
+        }
+        # Lookups derived from those categories; rebuilt only when the config itself is reloaded.
+        config_data['_category_index'] = {lib: build_category_index(cats) for lib, cats in config_data['_valid_categories'].items()}
+
         logging.info("Configuration loaded, validated, and defaults applied.")
         return config_data
 
@@ -321,13 +448,29 @@ def load_config():
         sys.exit(1)
 
 
+def load_config_cached():
+    """Returns the validated config, re-reading config.json only when its mtime or size changes."""
+    try:
+        st = os.stat(CONFIG_PATH)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+    if stamp is None or stamp != _CONFIG_CACHE["stamp"] or _CONFIG_CACHE["config"] is None:
+        config_data = load_config() # Exits via SystemExit on missing/invalid config
+        _CONFIG_CACHE["stamp"] = stamp
+        _CONFIG_CACHE["config"] = config_data
+    else:
+        logging.debug("Config file unchanged since last load. Reusing cached configuration.")
+    return _CONFIG_CACHE["config"]
+
+
 def connect_to_plex(config):
     plex_url, token = config.get('plex_url'), config.get('plex_token')
     if not plex_url or not token:
         logging.error("Plex URL/Token missing in config."); return None
     try:
         logging.info(f"Connecting to Plex: {plex_url}...");
-        plex = PlexServer(plex_url, token, timeout=90)
+        plex = PlexServer(plex_url, token, session=_HTTP_SESSION, timeout=90)
         server_name = plex.friendlyName
         logging.info(f"Connected to Plex server '{server_name}'.");
         return plex
@@ -341,68 +484,87 @@ def get_collections_from_library(plex, lib_name):
     if not plex or not lib_name or not isinstance(lib_name, str): return []
     try:
         logging.info(f"Accessing lib: '{lib_name}'"); lib = plex.library.section(lib_name)
-        logging.info(f"Fetching collections from '{lib_name}'..."); colls = lib.collections()
-        logging.info(f"Found {len(colls)} collections in '{lib_name}'."); return colls
+        logging.info(f"Fetching collections from '{lib_name}'..."); return lib.collections() # Count is logged per library by the caller
     except NotFound: logging.error(f"Library '{lib_name}' not found.") # Corrected error message for clarity
     except Exception as e: logging.error(f"Error fetching collections from library '{lib_name}': {e}", exc_info=True)
     return []
 
-def pin_collections(colls_to_pin, config, plex, library_name):
+def fetch_collections_for_libraries(plex, lib_names):
+    """Fetches collections for several libraries concurrently. Returns {library_name: collections}."""
+    valid_names = [n for n in dict.fromkeys(lib_names) if isinstance(n, str) and n.strip()]
+    if not plex or not valid_names: return {}
+    with ThreadPoolExecutor(max_workers=min(8, len(valid_names))) as executor:
+        fetched = executor.map(lambda name: get_collections_from_library(plex, name), valid_names)
+        return dict(zip(valid_names, fetched))
+
+def pin_single_collection(c, label_to_add, library_name, item_counts=None):
+    """Pins and labels one collection. Returns (title, discord_message) on success, otherwise None."""
     global _DRY_RUN_MODE_ACTIVE
-    if not colls_to_pin: return []
-    webhook_url = config.get('discord_webhook_url')
-    label_to_add = config.get('collexions_label')
-    successfully_pinned_titles = []
     dry_run_prefix = "[DRY-RUN] " if _DRY_RUN_MODE_ACTIVE else ""
+    if not hasattr(c, 'title') or not hasattr(c, 'key'):
+        logging.warning(f"{dry_run_prefix}Skipping invalid collection object: {c}"); return None
 
-    logging.info(f"{dry_run_prefix}--- Attempting to Pin {len(colls_to_pin)} Collections (for library '{library_name}') ---")
-
-    for c in colls_to_pin:
-        if not hasattr(c, 'title') or not hasattr(c, 'key'):
-            logging.warning(f"{dry_run_prefix}Skipping invalid collection object: {c}"); continue
+    coll_title = c.title
+    item_count_str = "?"
 
-        coll_title = c.title
-        item_count_str = "?"
+    try: # Main try for processing this collection
+        try: # Nested try for item count (reuses the count read during filtering when available)
+            item_count = item_counts[c.key] if item_counts and c.key in item_counts else c.childCount
+            item_count_str = f"{item_count} Item{'s' if item_count != 1 else ''}"
+        except Exception:
+            logging.debug("%sCould not retrieve item count for '%s'.", dry_run_prefix, coll_title)
 
-        try: # Main try for processing this collection
-            try: # Nested try for item count
-                item_count = c.childCount
-                item_count_str = f"{item_count} Item{'s' if item_count != 1 else ''}"
-            except Exception:
-                logging.debug(f"{dry_run_prefix}Could not retrieve item count for '{coll_title}'.")
+        logging.info(f"{dry_run_prefix}Processing for pin: '{coll_title}' ({item_count_str}) from library '{library_name}'")
 
-            logging.info(f"{dry_run_prefix}Processing for pin: '{coll_title}' ({item_count_str}) from library '{library_name}'")
+        if _DRY_RUN_MODE_ACTIVE:
+            logging.info(f"DRY-RUN: Would pin collection '{coll_title}'.")
+            discord_message = f"DRY-RUN: 📌 Collection '**{coll_title}**' ({item_count_str}) from **{library_name}** would be pinned."
+        else:
+            hub = c.visibility()
+            hub.promoteHome()
+            hub.promoteShared()
+            logging.info(f"Pinned '{coll_title}' successfully.")
+            discord_message = f"📌 Collection '**{coll_title}**' ({item_count_str}) from **{library_name}** pinned successfully."
 
+        if label_to_add:
             if _DRY_RUN_MODE_ACTIVE:
-                logging.info(f"DRY-RUN: Would pin collection '{coll_title}'.")
-                discord_message = f"DRY-RUN: 📌 Collection '**{coll_title}**' ({item_count_str}) from **{library_name}** would be pinned."
+                logging.info(f"DRY-RUN: Would add label '{label_to_add}' to '{coll_title}'.")
             else:
-                hub = c.visibility()
-                hub.promoteHome()
-                hub.promoteShared()
-                logging.info(f"Pinned '{coll_title}' successfully.")
-                discord_message = f"📌 Collection '**{coll_title}**' ({item_count_str}) from **{library_name}** pinned successfully."
+                try:
+                    logging.info(f"Attempting to add label '{label_to_add}' to '{coll_title}'...")
+                    c.addLabel(label_to_add)
+                    logging.info(f"Successfully added label '{label_to_add}' to '{coll_title}'.")
+                except Exception as label_error:
+                    logging.error(f"Failed to add label '{label_to_add}' to '{coll_title}': {label_error}")
 
-            successfully_pinned_titles.append(coll_title)
+        return coll_title, discord_message
 
-            if webhook_url:
-                send_discord_message(webhook_url, discord_message)
+    except NotFound:
+        logging.error(f"{dry_run_prefix}Collection '{coll_title}' not found during pin processing (maybe deleted?). Skipping.")
+    except Exception as e:
+        logging.error(f"{dry_run_prefix}Unexpected error processing collection '{coll_title}' for pinning: {e}", exc_info=True)
+    return None
 
-            if label_to_add:
-                if _DRY_RUN_MODE_ACTIVE:
-                    logging.info(f"DRY-RUN: Would add label '{label_to_add}' to '{coll_title}'.")
-                else:
-                    try:
-                        logging.info(f"Attempting to add label '{label_to_add}' to '{coll_title}'...")
-                        c.addLabel(label_to_add)
-                        logging.info(f"Successfully added label '{label_to_add}' to '{coll_title}'.")
-                    except Exception as label_error:
-                        logging.error(f"Failed to add label '{label_to_add}' to '{coll_title}': {label_error}")
-        
-        except NotFound:
-            logging.error(f"{dry_run_prefix}Collection '{coll_title}' not found during pin processing (maybe deleted?). Skipping.")
-        except Exception as e:
-            logging.error(f"{dry_run_prefix}Unexpected error processing collection '{coll_title}' for pinning: {e}", exc_info=True)
+
+def pin_collections(colls_to_pin, config, plex, library_name, item_counts=None, discord_lines_out=None):
+    global _DRY_RUN_MODE_ACTIVE
+    if not colls_to_pin: return []
+    webhook_url = config.get('discord_webhook_url')
+    label_to_add = config.get('collexions_label')
+    dry_run_prefix = "[DRY-RUN] " if _DRY_RUN_MODE_ACTIVE else ""
+
+    logging.info(f"{dry_run_prefix}--- Attempting to Pin {len(colls_to_pin)} Collections (for library '{library_name}') ---")
+
+    # Collections are independent, so their Plex round-trips run concurrently; map() keeps the selection order.
+    with ThreadPoolExecutor(max_workers=min(4, len(colls_to_pin))) as executor:
+        results = [r for r in executor.map(lambda c: pin_single_collection(c, label_to_add, library_name, item_counts), colls_to_pin) if r]
+    successfully_pinned_titles = [title for title, _ in results]
+    discord_lines = [message for _, message in results]
+
+    if discord_lines_out is not None: # Caller sends one batch for the whole run
+        discord_lines_out.extend(discord_lines)
+    elif webhook_url and discord_lines:
+        send_discord_batch(webhook_url, discord_lines)
 
     logging.info(f"{dry_run_prefix}--- Pinning process complete. {'Would have processed' if _DRY_RUN_MODE_ACTIVE else 'Successfully processed'} {len(successfully_pinned_titles)} collections for potential pinning. ---")
     return successfully_pinned_titles
@@ -425,7 +587,7 @@ def send_discord_message(webhook_url, message):
     data = {"content": message}
     logging.info("Sending message to Discord webhook...")
     try:
-        response = requests.post(webhook_url, json=data, timeout=15)
+        response = _HTTP_SESSION.post(webhook_url, json=data, timeout=15)
         response.raise_for_status()
         logging.info(f"Discord message sent successfully (Status: {response.status_code}).")
     except requests.exceptions.Timeout:
@@ -436,6 +598,19 @@ def send_discord_message(webhook_url, message):
         logging.error(f"An unexpected error occurred while sending Discord message: {e}")
 
 
+def send_discord_batch(webhook_url, lines, max_len=1900):
+    """Sends lines as few webhook messages as possible, each kept under Discord's 2000-character limit."""
+    batch, batch_len = [], 0
+    for line in lines:
+        if batch and batch_len + len(line) + 1 > max_len:
+            send_discord_message(webhook_url, "\n".join(batch))
+            batch, batch_len = [], 0
+        batch.append(line)
+        batch_len += len(line) + 1
+    if batch:
+        send_discord_message(webhook_url, "\n".join(batch))
+
+
 def get_trending_titles(config):
     """Fetches trending movie/show titles from TMDb or Trakt."""
     tmdb_key = config.get('tmdb_api_key')
@@ -450,7 +625,7 @@ def get_trending_titles(config):
     if tmdb_key:
         try:
             url = f"https://api.themoviedb.org/3/trending/all/week?api_key={tmdb_key}"
-            resp = requests.get(url, timeout=5)
+            resp = _HTTP_SESSION.get(url, timeout=5)
             if resp.status_code == 200:
                 for item in resp.json().get('results', []):
                     title = item.get('title') or item.get('name')
@@ -467,12 +642,12 @@ def get_trending_titles(config):
                 'trakt-api-key': trakt_id
             }
             # Trending movies
-            resp = requests.get("https://api.trakt.tv/movies/trending", headers=headers, timeout=5)
+            resp = _HTTP_SESSION.get("https://api.trakt.tv/movies/trending", headers=headers, timeout=5)
             if resp.status_code == 200:
                 for item in resp.json():
                     titles.add(item['movie']['title'].lower())
             # Trending shows
-            resp = requests.get("https://api.trakt.tv/shows/trending", headers=headers, timeout=5)
+            resp = _HTTP_SESSION.get("https://api.trakt.tv/shows/trending", headers=headers, timeout=5)
             if resp.status_code == 200:
                 for item in resp.json():
                     titles.add(item['show']['title'].lower())
@@ -482,7 +657,58 @@ def get_trending_titles(config):
     return titles
 
 
-def unpin_collections(plex, lib_names, config):
+def unpin_single_collection(collection, label_to_check, label_to_check_lc, exclusion_set):
+    """Unpins and unlabels one collection if it carries the label. Returns 'unpinned', 'excluded', or None."""
+    global _DRY_RUN_MODE_ACTIVE
+    dry_run_prefix = "[DRY-RUN] " if _DRY_RUN_MODE_ACTIVE else ""
+    coll_title = collection.title
+    hub = None
+    try:
+        # The label is checked before visibility() so only labelled collections need that round-trip.
+        # Reading labels can itself reload a partial plexapi object (e.g. when it has none), hence inside this try.
+        if not any(l.tag.lower() == label_to_check_lc for l in getattr(collection, 'labels', None) or ()):
+            return None
+        hub = collection.visibility()
+        if not (hub and hasattr(hub, '_promoted') and hub._promoted):
+            return None
+        if coll_title in exclusion_set: # Only promoted exclusions count as skipped
+            logging.info(f"{dry_run_prefix}Skipping unpin for '{coll_title}' (explicitly excluded).")
+            return 'excluded'
+        logging.debug("%sCollection '%s' is promoted and has the label '%s'.", dry_run_prefix, coll_title, label_to_check)
+
+        # Proceed with unpin/unlabel
+        logging.info(f"{dry_run_prefix}Attempting to unpin and remove label from '{coll_title}'...")
+        if _DRY_RUN_MODE_ACTIVE:
+            logging.info(f"DRY-RUN: Would remove label '{label_to_check}' from '{coll_title}'.")
+        else:
+            try:
+                collection.removeLabel(label_to_check)
+                logging.info(f"Removed label '{label_to_check}' from '{coll_title}'.")
+            except Exception as e_label:
+                logging.error(f"Failed to remove label '{label_to_check}' from '{coll_title}': {e_label}")
+
+        if _DRY_RUN_MODE_ACTIVE:
+            logging.info(f"DRY-RUN: Would unpin '{coll_title}'.")
+        else:
+            try:
+                hub.demoteHome()
+                hub.demoteShared()
+                logging.info(f"Unpinned '{coll_title}' successfully.")
+            except Exception as e_demote:
+                logging.error(f"Failed to demote/unpin '{coll_title}': {e_demote}")
+        return 'unpinned'
+    except NotFound:
+        logging.warning(f"{dry_run_prefix}Collection '{coll_title}' not found during visibility check (deleted?). Skipping.")
+    except AttributeError as ae:
+        if '_promoted' in str(ae).lower():
+             logging.error(f"{dry_run_prefix}Error checking promotion for '{coll_title}': `_promoted` attribute not found on hub. Hub: {hub}")
+        else:
+             logging.error(f"{dry_run_prefix}AttributeError checking visibility/processing '{coll_title}' for unpin: {ae}", exc_info=True)
+    except Exception as vis_error:
+        logging.error(f"{dry_run_prefix}Error checking visibility/processing '{coll_title}' for unpin: {vis_error}", exc_info=True)
+    return None
+
+def unpin_collections(plex, lib_names, config, collections_by_library=None):
     global _DRY_RUN_MODE_ACTIVE
     dry_run_prefix = "[DRY-RUN] " if _DRY_RUN_MODE_ACTIVE else ""
     if not plex:
@@ -492,6 +718,7 @@ def unpin_collections(plex, lib_names, config):
     if not label_to_check:
         logging.warning(f"{dry_run_prefix}Unpin skipped: 'collexions_label' not defined in config."); return
 
+    label_to_check_lc = label_to_check.lower()
     exclusion_set = set(config.get('exclusion_list', []))
 
     logging.info(f"{dry_run_prefix}--- Starting Unpin Check for Libraries: {lib_names} ---")
@@ -501,71 +728,33 @@ def unpin_collections(plex, lib_names, config):
     unpinned_count = 0
     label_removed_count = 0
     skipped_due_to_exclusion = 0
+    if collections_by_library is None:
+        collections_by_library = fetch_collections_for_libraries(plex, lib_names)
 
     for library_name in lib_names:
         if not isinstance(library_name, str) or not library_name.strip():
             logging.warning(f"{dry_run_prefix}Skipping invalid or empty library name during unpin: '{library_name}'"); continue
         try:
             logging.info(f"{dry_run_prefix}Checking library '{library_name}' for collections to unpin...")
-            library = plex.library.section(library_name)
-            collections_in_library = library.collections()
+            collections_in_library = collections_by_library.get(library_name, [])
             logging.info(f"{dry_run_prefix}Found {len(collections_in_library)} total collections in '{library_name}'. Checking promotion status and label...")
             processed_this_lib = 0
+            valid_collections = []
             for collection in collections_in_library:
                 processed_this_lib +=1
                 if not hasattr(collection, 'title') or not hasattr(collection, 'key'):
                     logging.warning(f"{dry_run_prefix}Skipping potentially invalid collection object #{processed_this_lib} in '{library_name}'"); continue
-                
-                coll_title = collection.title
-                try: # Inner try for operations on a single collection
-                    hub = collection.visibility()
-                    if hub and hasattr(hub, '_promoted') and hub._promoted:
-                        logging.debug(f"{dry_run_prefix}Collection '{coll_title}' is currently promoted. Checking label and exclusion...")
-                        current_labels = [l.tag.lower() for l in collection.labels] if hasattr(collection, 'labels') else []
-                        if label_to_check.lower() in current_labels:
-                            logging.debug(f"{dry_run_prefix}Collection '{coll_title}' has the label '{label_to_check}'.")
-                            if coll_title in exclusion_set:
-                                logging.info(f"{dry_run_prefix}Skipping unpin for '{coll_title}' (explicitly excluded).")
-                                skipped_due_to_exclusion += 1
-                                continue # to next collection
-                            
-                            # Proceed with unpin/unlabel
-                            logging.info(f"{dry_run_prefix}Attempting to unpin and remove label from '{coll_title}'...")
-                            if _DRY_RUN_MODE_ACTIVE:
-                                logging.info(f"DRY-RUN: Would remove label '{label_to_check}' from '{coll_title}'.")
-                            else:
-                                try:
-                                    collection.removeLabel(label_to_check)
-                                    logging.info(f"Removed label '{label_to_check}' from '{coll_title}'.")
-                                except Exception as e_label:
-                                    logging.error(f"Failed to remove label '{label_to_check}' from '{coll_title}': {e_label}")
-                            label_removed_count += 1
-
-                            if _DRY_RUN_MODE_ACTIVE:
-                                logging.info(f"DRY-RUN: Would unpin '{coll_title}'.")
-                            else:
-                                try:
-                                    hub.demoteHome()
-                                    hub.demoteShared()
-                                    logging.info(f"Unpinned '{coll_title}' successfully.")
-                                except Exception as e_demote:
-                                    logging.error(f"Failed to demote/unpin '{coll_title}': {e_demote}")
-                            unpinned_count += 1
-                        else:
-                            logging.debug(f"{dry_run_prefix}Collection '{coll_title}' is promoted but does not have label. Skipping.")
-                    # else: logging.debug(f"{dry_run_prefix}Collection '{coll_title}' is not promoted. Skipping.")
-                except NotFound:
-                    logging.warning(f"{dry_run_prefix}Collection '{coll_title}' not found during visibility check (deleted?). Skipping.")
-                except AttributeError as ae:
-                    if '_promoted' in str(ae).lower():
-                         logging.error(f"{dry_run_prefix}Error checking promotion for '{coll_title}': `_promoted` attribute not found on hub. Hub: {hub}")
-                    else:
-                         logging.error(f"{dry_run_prefix}AttributeError checking visibility/processing '{coll_title}' for unpin: {ae}", exc_info=True)
-                except Exception as vis_error:
-                    logging.error(f"{dry_run_prefix}Error checking visibility/processing '{coll_title}' for unpin: {vis_error}", exc_info=True)
+                valid_collections.append(collection)
+
+            if valid_collections:
+                # Per-collection Plex round-trips (label reloads, visibility, demote) run concurrently; each call handles its own errors.
+                with ThreadPoolExecutor(max_workers=min(4, len(valid_collections))) as executor:
+                    outcomes = list(executor.map(lambda c: unpin_single_collection(c, label_to_check, label_to_check_lc, exclusion_set), valid_collections))
+                unpinned_now = outcomes.count('unpinned')
+                unpinned_count += unpinned_now
+                label_removed_count += unpinned_now
+                skipped_due_to_exclusion += outcomes.count('excluded')
             logging.info(f"{dry_run_prefix}Finished checking {processed_this_lib} collections in '{library_name}'.")
-        except NotFound:
-            logging.error(f"{dry_run_prefix}Library '{library_name}' not found during unpin check.")
         except Exception as e:
             logging.error(f"{dry_run_prefix}General error during unpin process for library '{library_name}': {e}", exc_info=True)
 
@@ -576,8 +765,10 @@ def unpin_collections(plex, lib_names, config):
         logging.info(f"{dry_run_prefix}Skipped unpinning for {skipped_due_to_exclusion} collections due to exclusion list.")
 
 
-def get_active_special_collections(config):
-    current_date = datetime.now().date()
+def get_active_special_collections(config, current_date=None):
+    if current_date is None:
+        current_date = datetime.now().date()
+    today_md = (current_date.month, current_date.day)
     active_titles = []
     special_configs = config.get('special_collections', [])
 
@@ -585,7 +776,7 @@ def get_active_special_collections(config):
         logging.warning("Config 'special_collections' is not a list. No special collections will be processed.")
         return []
 
-    logging.info(f"--- Checking {len(special_configs)} Special Collection Periods for today ({current_date.strftime('%Y-%m-%d')}) ---")
+    logging.info("--- Checking %d Special Collection Periods for today (%s) ---", len(special_configs), current_date) # date str() is YYYY-MM-DD
     for i, special in enumerate(special_configs):
         if not isinstance(special, dict) or not all(k in special for k in ['start_date', 'end_date', 'collection_names']):
              logging.warning(f"Skipping invalid special collection entry #{i+1} (missing keys/not dict): {special}")
@@ -598,21 +789,17 @@ def get_active_special_collections(config):
         if not (isinstance(s_date_str, str) and isinstance(e_date_str, str) and isinstance(names, list) and all(isinstance(n, str) and n.strip() for n in names)):
              logging.warning(f"Skipping invalid special collection entry #{i+1} (incorrect data types or empty names): {special}")
              continue
-        try:
-            start_month_day = datetime.strptime(s_date_str, '%m-%d')
-            end_month_day = datetime.strptime(e_date_str, '%m-%d')
-            start_date = start_month_day.replace(year=current_date.year).date()
-            end_date = end_month_day.replace(year=current_date.year).date()
-
-            is_active_period = (start_date <= current_date <= end_date) if start_date <= end_date else (current_date >= start_date or current_date <= end_date)
-            
-            if is_active_period:
-                active_titles.extend(n for n in names if n) # Already checked for non-empty strings
-                logging.info(f"Special period for collections '{names}' is ACTIVE today ({start_date.strftime('%m-%d')} to {end_date.strftime('%m-%d')}).")
-        except ValueError: # Catches strptime errors
+        start_md = special.get('_start_md') or parse_month_day(s_date_str)
+        end_md = special.get('_end_md') or parse_month_day(e_date_str)
+        if start_md is None or end_md is None:
             logging.error(f"Invalid date format in special collection entry #{i+1}. Dates must be MM-DD. Entry: {special}")
-        except Exception as e:
-            logging.error(f"Error processing special collection entry #{i+1} ('{names}'): {e}", exc_info=True)
+            continue
+
+        is_active_period = (start_md <= today_md <= end_md) if start_md <= end_md else (today_md >= start_md or today_md <= end_md)
+
+        if is_active_period:
+            active_titles.extend(n for n in names if n) # Already checked for non-empty strings
+            logging.info(f"Special period for collections '{names}' is ACTIVE today ({s_date_str} to {e_date_str}).")
 
     unique_active = sorted(list(set(active_titles)))
     logging.info(f"--- Special Collection Check Complete ---")
@@ -627,23 +814,29 @@ def get_all_special_collection_names(config):
          if isinstance(special, dict) and 'collection_names' in special and isinstance(special['collection_names'], list):
              valid_names = {name.strip() for name in special['collection_names'] if isinstance(name, str) and name.strip()}
              all_special_titles.update(valid_names)
-    return all_special_titles
+    return frozenset(all_special_titles) # Shared read-only across every library in a run
 
 
-def get_fully_excluded_collections(config, active_special_collections):
-    exclusion_raw = config.get('exclusion_list', []) # Schema ensures this is a list
-    explicit_exclusion_set = {name.strip() for name in exclusion_raw if isinstance(name, str) and name.strip()}
-    logging.info(f"Explicit title exclusions from config: {explicit_exclusion_set or 'None'}")
+def get_fully_excluded_collections(config, active_special_collections, all_special_titles=None):
+    explicit_exclusion_set = config.get('_exclusion_titles')
+    if explicit_exclusion_set is None:
+        exclusion_raw = config.get('exclusion_list', []) # Schema ensures this is a list
+        explicit_exclusion_set = frozenset(name.strip() for name in exclusion_raw if isinstance(name, str) and name.strip())
+    info_enabled = logging.getLogger().isEnabledFor(logging.INFO) # The sorted() listings below are log-only
+    if info_enabled:
+        logging.info(f"Explicit title exclusions from config: {sorted(explicit_exclusion_set) or 'None'}")
 
-    all_special_titles = get_all_special_collection_names(config)
+    if all_special_titles is None:
+        all_special_titles = get_all_special_collection_names(config)
     active_special_set = set(active_special_collections)
     inactive_special_set = all_special_titles - active_special_set
-    if inactive_special_set:
-        logging.info(f"Inactive special collections (also excluded from random/category selection): {inactive_special_set}")
-    else:
-         logging.info("No inactive special collections identified for additional exclusion.")
     combined_exclusion_set = explicit_exclusion_set.union(inactive_special_set)
-    logging.info(f"Total combined title exclusions (explicit + inactive special): {combined_exclusion_set or 'None'}")
+    if info_enabled:
+        if inactive_special_set:
+            logging.info(f"Inactive special collections (also excluded from random/category selection): {sorted(inactive_special_set)}")
+        else:
+             logging.info("No inactive special collections identified for additional exclusion.")
+        logging.info(f"Total combined title exclusions (explicit + inactive special): {sorted(combined_exclusion_set) or 'None'}")
     return combined_exclusion_set
 
 
@@ -655,105 +848,121 @@ def fill_with_random_collections(random_collections_pool, remaining_slots):
     if not random_collections_pool:
         logging.info("No eligible collections left in the pool for random selection.")
         return collections_to_pin
-    available = list(random_collections_pool)
-    random.shuffle(available)
-    num_to_select = min(remaining_slots, len(available))
-    logging.info(f"Selecting up to {num_to_select} random collection(s) from the remaining {len(available)} eligible items.")
-    selected_random = available[:num_to_select]
+    num_to_select = min(remaining_slots, len(random_collections_pool))
+    logging.info(f"Selecting up to {num_to_select} random collection(s) from the remaining {len(random_collections_pool)} eligible items.")
+    selected_random = _RNG.sample(random_collections_pool, num_to_select)
     collections_to_pin.extend(selected_random)
-    if selected_random:
-        selected_titles = [getattr(c, 'title', 'Untitled') for c in selected_random]
-        logging.info(f"Added {len(selected_titles)} random collection(s): {selected_titles}")
+    if selected_random and logging.getLogger().isEnabledFor(logging.INFO):
+        selected_titles = [c.title for c in selected_random]
+        logging.info("Added %d random collection(s): %s", len(selected_titles), selected_titles)
     return collections_to_pin
 
 
-def filter_collections(config, all_collections_in_library, active_special_titles, library_pin_limit, library_name, selected_collections_history, trending_titles=None):
+def filter_collections(config, all_collections_in_library, active_special_titles, library_pin_limit, library_name, selected_collections_history, trending_titles=None, all_special_titles=None, item_counts=None, titles_excluded=None, recent_pins=None):
     # Using the user's latest version of filter_collections from their uploaded ColleXions.py
     logging.info(f">>> Current filter_collections for LIBRARY: '{library_name}' <<<")
 
     min_items = config.get('min_items_for_pinning', 10) # Default from schema
     # Schema ensures min_items is int >= 0
-    titles_excluded = get_fully_excluded_collections(config, active_special_titles)
-    recent_pins = get_recently_pinned_collections(selected_collections_history, config)
-    regex_patterns = config.get('regex_exclusion_patterns', []) # Default from schema
+    active_special_set = frozenset(active_special_titles)
+    if titles_excluded is None:
+        titles_excluded = get_fully_excluded_collections(config, active_special_set, all_special_titles)
+    if recent_pins is None:
+        recent_pins = get_recently_pinned_collections(selected_collections_history, config)
+    else: # Computed once per run by main; repeated here so each library's log block carries its own summary
+        log_recently_pinned_summary(recent_pins, config.get('repeat_block_hours', 12))
+    cached_regex = config.get('_compiled_regex_exclusions') # Compiled in load_config
+    if cached_regex is None:
+        compiled = compile_exclusion_patterns(config.get('regex_exclusion_patterns', []))
+        cached_regex = config['_compiled_regex_exclusions'] = (compiled, combine_exclusion_patterns(compiled))
+    compiled_regex_patterns, combined_regex_pattern = cached_regex
     use_random_category_mode = config.get('use_random_category_mode', False) # Default from schema
     skip_perc = config.get('random_category_skip_percent', 70) # Default and range from schema
 
-    try:
-        raw_categories_for_library = config.get('categories', {}).get(library_name, [])
-        library_categories_config = copy.deepcopy(raw_categories_for_library)
-    except Exception as e:
-        logging.error(f"Error deepcopying categories for '{library_name}': {e}. Proceeding with empty categories.")
-        library_categories_config = []
+    library_categories_config = config.get('categories', {}).get(library_name, []) # Read-only; never mutated below
 
     logging.info(f"Filtering for '{library_name}': Min Items={min_items}, Random Cat Mode={use_random_category_mode}, Cat Skip Chance={skip_perc}%")
 
-    eligible_pool = []
+    # Specials and everything else are partitioned in the same pass that checks eligibility.
+    special_candidates = {} # One candidate per active special title
+    pool_after_specials_processing = []
+    pool_by_title = {} # Non-special eligible collections indexed by title
+    eligible_count = 0
+    add_to_pool = pool_after_specials_processing.append # Bound once for the per-collection loop
     logging.info(f"Processing {len(all_collections_in_library)} collections found in '{library_name}' through initial filters...")
     for c in all_collections_in_library:
-        if not hasattr(c, 'title') or not c.title:
-            logging.debug(f"Skipping collection with missing title: {c}")
+        title = getattr(c, 'title', None) # Single lookup; plexapi may resolve attributes lazily
+        if not title:
+            logging.debug("Skipping collection with missing title: %s", c)
             continue
-        title = c.title
-        is_special = title in active_special_titles
+        is_special = title in active_special_set
 
         if title in titles_excluded:
-            logging.debug(f" Excluding '{title}' (Reason: Explicit or Inactive Special Title Exclusion).")
+            logging.debug(" Excluding '%s' (Reason: Explicit or Inactive Special Title Exclusion).", title)
             continue
-        if is_regex_excluded(title, regex_patterns):
+        if compiled_regex_patterns and is_regex_excluded(title, compiled_regex_patterns, combined_regex_pattern): # No call at all when no patterns are configured
             continue
         if not is_special and title in recent_pins:
-            logging.debug(f" Excluding '{title}' (Reason: Recently pinned non-special item within repeat block).")
+            logging.debug(" Excluding '%s' (Reason: Recently pinned non-special item within repeat block).", title)
             continue
         if not is_special:
             try:
-                item_count = c.childCount
-                if item_count < min_items:
-                    logging.debug(f" Excluding '{title}' (Reason: Low item count: {item_count} < {min_items}).")
-                    continue
-            except AttributeError:
-                logging.warning(f" Excluding '{title}' due to AttributeError when getting item count (childCount).")
-                continue
+                item_count = c.childCount # plexapi may reload a partial object here, raising NotFound or request errors
             except Exception as e:
                 logging.warning(f" Excluding '{title}' due to error getting item count: {e}")
                 continue
-        eligible_pool.append(c)
+            if not isinstance(item_count, int):
+                logging.warning(f" Excluding '{title}' (Reason: item count (childCount) unavailable).")
+                continue
+            if item_counts is not None:
+                item_counts[c.key] = item_count
+            if item_count < min_items:
+                logging.debug(" Excluding '%s' (Reason: Low item count: %s < %s).", title, item_count, min_items)
+                continue
+        eligible_count += 1
+        if is_special:
+            special_candidates[title] = c
+        else:
+            add_to_pool(c)
+            pool_by_title[title] = c
 
-    logging.info(f"Found {len(eligible_pool)} eligible collections in '{library_name}' after initial filtering.")
-    if not eligible_pool:
+    logging.info(f"Found {eligible_count} eligible collections in '{library_name}' after initial filtering.")
+    if not eligible_count:
         logging.info(f"No collections eligible for pinning in '{library_name}'. Skipping priority selection.")
         return []
 
     collections_to_pin = []
-    pinned_titles_this_run = set()
     remaining_slots = library_pin_limit
-    random.shuffle(eligible_pool)
 
     logging.info(f"Selection Step 1: Prioritizing Active Special Collection(s) for '{library_name}'.")
-    specials_selected_now = []
-    pool_after_specials_processing = []
-    for c_item in eligible_pool:
-        coll_title = c_item.title
-        if coll_title in active_special_titles and remaining_slots > 0 and coll_title not in pinned_titles_this_run:
-            logging.info(f"  Selecting ACTIVE special collection: '{coll_title}'")
-            specials_selected_now.append(c_item)
-            pinned_titles_this_run.add(coll_title)
-            remaining_slots -= 1
-        else:
-            pool_after_specials_processing.append(c_item)
+    special_titles_selected = _RNG.sample(list(special_candidates), min(len(special_candidates), remaining_slots))
+    specials_selected_now = [special_candidates[title] for title in special_titles_selected]
+    pinned_titles_this_run = set(special_titles_selected) # Seeded in one go; later steps add their picks
+    for title in special_titles_selected:
+        logging.info("  Selecting ACTIVE special collection: '%s'", title)
+    remaining_slots -= len(specials_selected_now)
     collections_to_pin.extend(specials_selected_now)
     logging.info(f"Selected {len(specials_selected_now)} special collection(s). Remaining slots: {remaining_slots}")
 
+    if remaining_slots <= 0:
+        logging.info(f"Pin limit for '{library_name}' filled by special collections. Skipping trending, category and random selection.")
+        logging.info(f"--- Filtering and Selection Complete for '{library_name}' ---")
+        return collections_to_pin
+    _RNG.shuffle(pool_after_specials_processing) # Trending and default-mode category picks follow pool order
+
     if remaining_slots > 0 and trending_titles:
         logging.info(f"Selection Step 1.5: Processing Trending Collections (Global Trends) for '{library_name}'.")
         trending_selected_now = []
         # We'll re-filter pool_after_specials_processing for items matching trending_titles
         temp_pool = []
-        for c_item in pool_after_specials_processing:
-            if remaining_slots > 0 and c_item.title.lower() in trending_titles and c_item.title not in pinned_titles_this_run:
-                logging.info(f"  Selecting TRENDING collection: '{c_item.title}'")
+        for idx, c_item in enumerate(pool_after_specials_processing):
+            if remaining_slots <= 0:
+                temp_pool.extend(pool_after_specials_processing[idx:]); break
+            item_title = c_item.title
+            if item_title.lower() in trending_titles and item_title not in pinned_titles_this_run:
+                logging.info("  Selecting TRENDING collection: '%s'", item_title)
                 trending_selected_now.append(c_item)
-                pinned_titles_this_run.add(c_item.title)
+                pinned_titles_this_run.add(item_title)
                 remaining_slots -= 1
             else:
                 temp_pool.append(c_item)
@@ -763,78 +972,79 @@ def filter_collections(config, all_collections_in_library, active_special_titles
         logging.info(f"Selected {len(trending_selected_now)} trending collection(s). Remaining slots: {remaining_slots}")
 
     category_collections_selected_now = []
-    pool_for_random_fill = list(pool_after_specials_processing)
+    pool_for_random_fill = pool_after_specials_processing # Not copied: the final filter below builds a fresh list and category picks are removed via titles_blocked_from_random
     titles_from_served_categories_for_random_exclusion = set()
 
     if remaining_slots > 0 and library_categories_config:
         logging.info(f"Selection Step 2: Processing Categories for '{library_name}' (Random Mode: {use_random_category_mode}).")
-        valid_categories_for_lib = [cat_dict for cat_dict in library_categories_config if isinstance(cat_dict, dict) and cat_dict.get('pin_count', 0) > 0 and cat_dict.get('collections')]
+        valid_categories_for_lib = config.get('_valid_categories', {}).get(library_name, [])
+        category_index = config.get('_category_index', {}).get(library_name) or build_category_index(valid_categories_for_lib)
 
         if not valid_categories_for_lib:
             logging.info(f"  No valid (enabled and with collections) categories found for '{library_name}'.")
+        elif category_index['all_titles'].isdisjoint(pool_by_title):
+            logging.info(f"  None of the remaining eligible collections in '{library_name}' belong to a valid category. Skipping category selection.")
         else:
             if use_random_category_mode:
-                for cat_conf in valid_categories_for_lib:
-                    titles_from_served_categories_for_random_exclusion.update(cat_conf.get('collections', []))
+                titles_from_served_categories_for_random_exclusion.update(category_index['all_titles'])
                 logging.info(f"  Random Category Mode: {len(titles_from_served_categories_for_random_exclusion)} titles from all defined valid categories in '{library_name}' will be excluded from random fill.")
 
-                if random.random() < (skip_perc / 100.0):
+                if _RNG.random() < (skip_perc / 100.0):
                     logging.info(f"  Category selection SKIPPED for '{library_name}' due to {skip_perc}% chance.")
                 else:
-                    chosen_category_config = random.choice(valid_categories_for_lib)
+                    chosen_category_config = _RNG.choice(valid_categories_for_lib)
                     cat_name = chosen_category_config.get('category_name', 'Unnamed Random Category')
                     cat_pin_count = chosen_category_config.get('pin_count', 0)
-                    cat_titles_defined = set(chosen_category_config.get('collections', []))
+                    cat_titles_defined = frozenset(chosen_category_config.get('collections', ()))
                     logging.info(f"  Randomly selected category: '{cat_name}' (Target Pins: {cat_pin_count}, Defined Titles: {len(cat_titles_defined)})")
-                    eligible_for_this_cat = [item for item in pool_after_specials_processing if item.title in cat_titles_defined and item.title not in pinned_titles_this_run]
+                    eligible_titles_for_cat = cat_titles_defined - pinned_titles_this_run
+                    eligible_for_this_cat = [pool_by_title[t] for t in eligible_titles_for_cat if t in pool_by_title]
                     num_to_pick_from_cat = min(cat_pin_count, len(eligible_for_this_cat), remaining_slots)
                     if num_to_pick_from_cat > 0:
-                        random.shuffle(eligible_for_this_cat)
-                        picked_for_this_cat = eligible_for_this_cat[:num_to_pick_from_cat]
+                        picked_for_this_cat = _RNG.sample(eligible_for_this_cat, num_to_pick_from_cat)
                         category_collections_selected_now.extend(picked_for_this_cat)
-                        for p_item in picked_for_this_cat: pinned_titles_this_run.add(p_item.title)
+                        picked_titles = [p_item.title for p_item in picked_for_this_cat]
+                        pinned_titles_this_run.update(picked_titles)
                         remaining_slots -= len(picked_for_this_cat)
-                        logging.info(f"  Selected {len(picked_for_this_cat)} item(s) from '{cat_name}': {[item.title for item in picked_for_this_cat]}")
+                        logging.info("  Selected %d item(s) from '%s': %s", len(picked_titles), cat_name, picked_titles)
             else: # Default Category Mode
-                category_slots_remaining = {cat.get('category_name'): cat.get('pin_count',0) for cat in valid_categories_for_lib}
-                collection_to_category_map = {}
-                for cat_conf in valid_categories_for_lib:
-                    cat_name_map = cat_conf.get('category_name')
-                    for title_in_cat in cat_conf.get('collections', []):
-                        collection_to_category_map.setdefault(title_in_cat, []).append(cat_name_map)
+                category_slots_remaining = dict(category_index['pin_counts']) # Per-call copy; decremented as slots fill
+                collection_to_category_map = category_index['categories_by_title']
                 temp_pool_after_default_categories = []
-                for c_item in pool_after_specials_processing:
-                    item_title = c_item.title
-                    picked_this_item_by_cat = False
+                category_selections = []
+                served_category_names = set()
+                keep_for_random_fill = temp_pool_after_default_categories.append
+                for idx, c_item in enumerate(pool_after_specials_processing):
                     if remaining_slots <= 0:
-                        temp_pool_after_default_categories.append(c_item); continue
-                    if item_title in collection_to_category_map and item_title not in pinned_titles_this_run:
-                        for cat_name_item_belongs_to in collection_to_category_map[item_title]:
-                            if category_slots_remaining.get(cat_name_item_belongs_to, 0) > 0:
-                                logging.info(f"  Selecting '{item_title}' for category '{cat_name_item_belongs_to}'.")
-                                category_collections_selected_now.append(c_item)
-                                pinned_titles_this_run.add(item_title)
-                                remaining_slots -= 1
-                                category_slots_remaining[cat_name_item_belongs_to] -= 1
-                                for cat_conf_detail in valid_categories_for_lib:
-                                    if cat_conf_detail.get('category_name') == cat_name_item_belongs_to:
-                                        titles_from_served_categories_for_random_exclusion.update(cat_conf_detail.get('collections',[]))
-                                        break
-                                picked_this_item_by_cat = True
-                                break
-                    if not picked_this_item_by_cat:
-                        temp_pool_after_default_categories.append(c_item)
+                        temp_pool_after_default_categories.extend(pool_after_specials_processing[idx:]); break
+                    item_title = c_item.title
+                    item_cat_names = collection_to_category_map.get(item_title)
+                    if not item_cat_names or item_title in pinned_titles_this_run:
+                        keep_for_random_fill(c_item); continue
+                    for cat_name_item_belongs_to in item_cat_names:
+                        if category_slots_remaining[cat_name_item_belongs_to] > 0:
+                            category_selections.append((item_title, cat_name_item_belongs_to))
+                            category_collections_selected_now.append(c_item)
+                            pinned_titles_this_run.add(item_title)
+                            remaining_slots -= 1
+                            category_slots_remaining[cat_name_item_belongs_to] -= 1
+                            served_category_names.add(cat_name_item_belongs_to)
+                            break
+                    else: # No category with open slots claimed this item
+                        keep_for_random_fill(c_item)
+                category_titles = category_index['category_titles']
+                first_position_by_name = category_index['first_position_by_name']
+                titles_from_served_categories_for_random_exclusion.update(*(category_titles[first_position_by_name[name]] for name in served_category_names))
+                if category_selections:
+                    logging.info("  Category selections (title, category): %s", category_selections)
                 pool_for_random_fill = temp_pool_after_default_categories
             collections_to_pin.extend(category_collections_selected_now)
             logging.info(f"Selected {len(category_collections_selected_now)} collection(s) from categories. Remaining slots: {remaining_slots}")
     else:
         logging.info(f"Skipping category selection for '{library_name}' (Slots left: {remaining_slots}, Categories defined: {bool(library_categories_config)}).")
-        pool_for_random_fill = list(pool_after_specials_processing)
 
-    final_random_candidates = []
-    for item in pool_for_random_fill:
-        if item.title not in pinned_titles_this_run and item.title not in titles_from_served_categories_for_random_exclusion:
-            final_random_candidates.append(item)
+    titles_blocked_from_random = pinned_titles_this_run | titles_from_served_categories_for_random_exclusion
+    final_random_candidates = [item for item in pool_for_random_fill if item.title not in titles_blocked_from_random]
     logging.info(f"Pool for random fill (after category exclusions & already pinned items): {len(final_random_candidates)} items. Titles excluded due to category service: {len(titles_from_served_categories_for_random_exclusion)}")
 
     if remaining_slots > 0:
@@ -845,22 +1055,24 @@ def filter_collections(config, all_collections_in_library, active_special_titles
     else:
         logging.info(f"Skipping random selection for '{library_name}' (no remaining slots).")
 
-    final_selected_titles = [getattr(c, 'title', 'Untitled') for c in collections_to_pin]
     logging.info(f"--- Filtering and Selection Complete for '{library_name}' ---")
-    logging.info(f"Final list of {len(final_selected_titles)} collections selected for pinning: {final_selected_titles if final_selected_titles else 'None'}")
+    if logging.getLogger().isEnabledFor(logging.INFO): # Skip building the title list when INFO is filtered out
+        final_selected_titles = [c.title for c in collections_to_pin]
+        logging.info("Final list of %d collections selected for pinning: %s", len(final_selected_titles), final_selected_titles or 'None')
     return collections_to_pin
 
 # --- Main Function ---
-def main():
+def main(config=None):
     global _DRY_RUN_MODE_ACTIVE
     run_start_time = datetime.now()
     logging.info(f"====== Starting Collexions Script Run at {run_start_time.strftime('%Y-%m-%d %H:%M:%S')}{' (DRY RUN)' if _DRY_RUN_MODE_ACTIVE else ''} ======")
 
-    try:
-        config = load_config()
-    except SystemExit:
-        update_status("CRITICAL: Config Error")
-        return
+    if config is None:
+        try:
+            config = load_config_cached()
+        except SystemExit:
+            update_status("CRITICAL: Config Error")
+            return
 
     pin_interval_minutes = config.get('pinning_interval', 180)
     next_run_calc_time = run_start_time + timedelta(minutes=pin_interval_minutes)
@@ -872,7 +1084,13 @@ def main():
         logging.critical(f"{'[DRY-RUN] ' if _DRY_RUN_MODE_ACTIVE else ''}Failed to connect to Plex. Aborting this run.")
         return
 
-    selected_collections_history = load_selected_collections()
+    repeat_block_hours = config.get('repeat_block_hours', 12)
+    recency_block_enabled = repeat_block_hours != 0
+    if recency_block_enabled:
+        selected_collections_history = load_selected_collections()
+    else:
+        logging.info("Repeat block hours set to 0. Skipping history file load for this run.")
+        selected_collections_history = {}
     library_names = config.get('library_names', [])
     trending_titles = get_trending_titles(config)
     if trending_titles:
@@ -880,11 +1098,24 @@ def main():
 
     if not library_names:
         logging.warning(f"{'[DRY-RUN] ' if _DRY_RUN_MODE_ACTIVE else ''}No 'library_names' defined in config. Nothing to process for pinning/unpinning.")
+        collections_by_library = {}
     else:
-        unpin_collections(plex, library_names, config)
+        # One concurrent fetch serves both passes; pinning never reads the labels unpinning may have changed.
+        collections_by_library = fetch_collections_for_libraries(plex, library_names)
+        unpin_collections(plex, library_names, config, collections_by_library)
 
     collections_per_library_config = config.get('number_of_collections_to_pin', {})
+    # Specials are resolved once per run so every library sees the same date snapshot.
+    active_specials = get_active_special_collections(config, run_start_time.date())
+    all_special_titles_ever = config.get('_all_special_titles')
+    if all_special_titles_ever is None:
+        all_special_titles_ever = get_all_special_collection_names(config)
+    # Exclusions and the recency block only depend on config, today's specials and the history loaded above,
+    # so they are resolved once here rather than once per library.
+    titles_excluded_this_run = get_fully_excluded_collections(config, active_specials, all_special_titles_ever)
+    recent_pins_this_run = get_recently_pinned_collections(selected_collections_history, config)
     all_newly_pinned_titles_this_run = []
+    discord_lines_this_run = []
 
     for library_name in library_names:
         if not isinstance(library_name, str) or not library_name.strip():
@@ -903,18 +1134,20 @@ def main():
         update_status(f"Processing: {library_name}", next_run_calc_time.timestamp())
         library_process_start_time = time.time()
 
-        all_colls_in_lib = get_collections_from_library(plex, library_name)
+        all_colls_in_lib = collections_by_library.get(library_name, [])
         if not all_colls_in_lib:
             logging.info(f"{'[DRY-RUN] ' if _DRY_RUN_MODE_ACTIVE else ''}No collections found or retrieved from library '{library_name}'. Skipping pinning for this library.")
             continue
+        logging.info(f"Found {len(all_colls_in_lib)} collections in '{library_name}'.") # Inside the library block, where the Dashboard reads it
 
-        active_specials = get_active_special_collections(config)
+        item_counts = {} # Filled by filter_collections, reused for pin messages
         colls_to_pin_for_library = filter_collections(
-            config, all_colls_in_lib, active_specials, pin_limit, library_name, selected_collections_history, trending_titles=trending_titles
+            config, all_colls_in_lib, active_specials, pin_limit, library_name, selected_collections_history, trending_titles=trending_titles, all_special_titles=all_special_titles_ever, item_counts=item_counts,
+            titles_excluded=titles_excluded_this_run, recent_pins=recent_pins_this_run
         )
 
         if colls_to_pin_for_library:
-            successfully_pinned_titles = pin_collections(colls_to_pin_for_library, config, plex, library_name)
+            successfully_pinned_titles = pin_collections(colls_to_pin_for_library, config, plex, library_name, item_counts=item_counts, discord_lines_out=discord_lines_this_run)
             all_newly_pinned_titles_this_run.extend(successfully_pinned_titles)
         else:
             logging.info(f"{'[DRY-RUN] ' if _DRY_RUN_MODE_ACTIVE else ''}No collections were selected for pinning in '{library_name}' after filtering.")
@@ -922,15 +1155,23 @@ def main():
         logging.info(f"{'[DRY-RUN] ' if _DRY_RUN_MODE_ACTIVE else ''}Finished processing library '{library_name}' in {time.time() - library_process_start_time:.2f} seconds.")
         logging.info(f"{'[DRY-RUN] ' if _DRY_RUN_MODE_ACTIVE else ''}===== Completed Library: '{library_name}' =====")
 
-    if all_newly_pinned_titles_this_run:
+    webhook_url = config.get('discord_webhook_url')
+    if webhook_url and discord_lines_this_run:
+        send_discord_batch(webhook_url, discord_lines_this_run)
+
+    if not recency_block_enabled:
+        logging.info(f"{'[DRY-RUN] ' if _DRY_RUN_MODE_ACTIVE else ''}Recency block disabled (repeat_block_hours = 0). History file not updated.")
+    elif all_newly_pinned_titles_this_run:
         current_timestamp_iso = datetime.now().isoformat()
         unique_new_pins_all = set(all_newly_pinned_titles_this_run)
-        all_special_titles_ever = get_all_special_collection_names(config)
-        non_special_pins_for_history = sorted(list(unique_new_pins_all - all_special_titles_ever))
+        non_special_pins_for_history = sorted(unique_new_pins_all - all_special_titles_ever)
 
         if non_special_pins_for_history:
             if not isinstance(selected_collections_history, dict): selected_collections_history = {}
             selected_collections_history[current_timestamp_iso] = non_special_pins_for_history
+            while len(selected_collections_history) > MAX_HISTORY_ENTRIES: # Dicts keep insertion order, oldest first
+                selected_collections_history.pop(next(iter(selected_collections_history)))
+            # Retention: main's recency scan already dropped entries outside the window, and the cap bounds the rest.
             save_selected_collections(selected_collections_history)
             logging.info(f"{'[DRY-RUN] ' if _DRY_RUN_MODE_ACTIVE else ''}Updated history file for timestamp {current_timestamp_iso} with {len(non_special_pins_for_history)} non-special pinned items.")
             num_specials_pinned = len(unique_new_pins_all) - len(non_special_pins_for_history)
@@ -947,6 +1188,12 @@ def main():
 
 
 # --- Continuous Loop ---
+_STOP_EVENT = threading.Event() # Set on SIGTERM so the sleep between runs ends without waiting out the interval
+
+def request_stop(signum=None, frame=None):
+    """SIGTERM handler installed only while sleeping between runs; just wakes the wait (no logging here)."""
+    _STOP_EVENT.set()
+
 def run_continuously():
     global _DRY_RUN_MODE_ACTIVE
     while True:
@@ -955,15 +1202,13 @@ def run_continuously():
         pin_interval_from_config_for_sleep = 180
 
         try:
-            temp_config_for_interval = {}
-            if os.path.exists(CONFIG_PATH):
-                try:
-                    with open(CONFIG_PATH, 'r', encoding='utf-8') as f_temp:
-                        temp_config_for_interval = json.load(f_temp)
-                except Exception as e_cfg_read:
-                    logging.warning(f"Could not read config for interval pre-main(): {e_cfg_read}. Using default interval.")
-            
-            current_pin_interval = temp_config_for_interval.get('pinning_interval', 180)
+            try:
+                config = load_config_cached()
+            except SystemExit:
+                config = None
+                update_status("CRITICAL: Config Error")
+
+            current_pin_interval = config.get('pinning_interval', 180) if config else 180
             if not isinstance(current_pin_interval, (int, float)) or current_pin_interval <= 0:
                 current_pin_interval = 180
             pin_interval_from_config_for_sleep = current_pin_interval
@@ -971,7 +1216,8 @@ def run_continuously():
             sleep_seconds_calc = pin_interval_from_config_for_sleep * 60
             next_run_ts_planned_for_status = (run_cycle_start_time + timedelta(seconds=sleep_seconds_calc)).timestamp()
 
-            main()
+            if config:
+                main(config)
 
         except KeyboardInterrupt:
             logging.info(f"Keyboard interrupt received. Exiting Collexions script.{' (DRY RUN was active)' if _DRY_RUN_MODE_ACTIVE else ''}")
@@ -1004,12 +1250,20 @@ def run_continuously():
         # else: The crash scenario above will set a short sleep and new next_run_ts_planned_for_status
 
         logging.info(f"CALC: Sleeping for approximately {actual_sleep_duration:.0f} seconds to maintain {pin_interval_from_config_for_sleep}m frequency...")
+        # SIGTERM (docker stop, WebUI Stop) keeps its default immediate kill during a run; only the sleep handles it.
+        previous_sigterm_handler = signal.signal(signal.SIGTERM, request_stop)
         try:
-            time.sleep(actual_sleep_duration)
+            stop_requested = _STOP_EVENT.wait(actual_sleep_duration) # Blocks without polling; returns True as soon as a stop is requested
         except KeyboardInterrupt:
              logging.info(f"Keyboard interrupt received during sleep. Exiting Collexions script.{' (DRY RUN was active)' if _DRY_RUN_MODE_ACTIVE else ''}")
              update_status("Stopped (Interrupt during sleep)")
              break
+        finally:
+            signal.signal(signal.SIGTERM, previous_sigterm_handler)
+        if stop_requested:
+            logging.info(f"Stop requested during sleep. Exiting Collexions script.{' (DRY RUN was active)' if _DRY_RUN_MODE_ACTIVE else ''}")
+            update_status("Stopped (Signal)")
+            break
 
 # --- Script Entry Point ---
 if __name__ == "__main__":